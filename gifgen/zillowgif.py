@@ -1,177 +1,594 @@
-# Required libraries: pandas, requests, matplotlib, imageio
-# Install them using: pip install pandas requests matplotlib imageio
+# Required libraries: pandas, numpy, requests, matplotlib, Pillow, tqdm
+# Optional: pyarrow (enables the Parquet cache that skips re-parsing the CSV)
+#           pygifsicle (shrinks the GIF with gifsicle, which must be on the PATH)
+# Install them using: pip install pandas numpy requests matplotlib Pillow tqdm pyarrow pygifsicle
 
 import pandas as pd
 import requests
+import matplotlib
+# Frames are only rendered off-screen, so use Agg and skip loading a GUI toolkit
+matplotlib.use('Agg')
+matplotlib.rcParams.update({
+    'path.simplify': True,
+    'path.simplify_threshold': 1.0,
+    'agg.path.chunksize': 10000,
+    'figure.autolayout': False, # tight_layout() is applied once when the figure is built
+    'text.hinting': 'none',
+})
 import matplotlib.pyplot as plt
-import imageio
+import matplotlib.dates as mdates
+import matplotlib.colors as mcolors
+from matplotlib import font_manager
+from PIL import Image, ImageDraw, ImageFont
+from tqdm import tqdm
+import numpy as np
+import json
+import math
 import os
+import re
+import sqlite3
 import tempfile
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    # Without pyarrow the CSV is scanned on every run instead of being cached
+    pq = None
+
+try:
+    import pygifsicle
+except ImportError:
+    # Without pygifsicle the GIF is saved as written by Pillow
+    pygifsicle = None
 
 # URL of the Zillow ZHVI data (middle tier, SFR/Condo, smoothed, seasonally adjusted, by month)
 DATA_URL = 'https://files.zillowstatic.com/research/public_csvs/zhvi/Zip_zhvi_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv'
 # Local filename to save the downloaded CSV
 CSV_FILENAME = 'zhvi_zip_data.csv'
+# (connect, read) timeout in seconds for the download; when it expires, an existing local copy is used
+DOWNLOAD_TIMEOUT = (10, 60)
+# Local filename of the columnar cache built from the CSV
+PARQUET_FILENAME = 'zhvi_zip_data.parquet'
+# Local filename of the cache of per-ZIP time series already extracted from the CSV
+SERIES_CACHE_FILENAME = 'zhvi_cache.db'
+# Rows per Parquet row group; small groups keep single-ZIP reads cheap
+PARQUET_ROW_GROUP_SIZE = 1024
+# Zillow uses 'YYYY-MM-DD' format for its monthly data columns
+DATE_COLUMN_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+# Metadata columns needed alongside the monthly values
+METADATA_COLUMNS = ['RegionName', 'City', 'State']
+# Rows parsed per chunk when scanning the CSV for a single ZIP code
+CSV_CHUNK_SIZE = 2000
+# Number of colors in the GIF palette. The chart only uses a handful of colors
+# (background, grid, text and the line), plus their anti-aliased blends.
+GIF_PALETTE_SIZE = 32
+# Size and default resolution of the animation frames. A 256-color GIF gains little
+# from more pixels, so the default gives 720x450 frames; pass a higher dpi for HiDPI output.
+FRAME_FIGSIZE = (8, 5)
+DEFAULT_FRAME_DPI = 90
+# Color of the ZHVI line and its markers
+LINE_COLOR = 'dodgerblue'
+# Frames handed to a worker process at a time
+FRAMES_PER_TASK = 4
+# Frame pixels a worker process must draw to be worth starting. Drawing a frame takes
+# about 1 ms at the default size, while starting a worker and building its
+# FrameRenderer costs about as much as drawing 100 or more frames.
+PIXELS_PER_WORKER = 250_000_000
+
+def load_download_metadata(meta_filename):
+    """
+    Returns the ETag/Last-Modified headers saved with a previous download,
+    or an empty dict if there are none.
+    """
+    try:
+        with open(meta_filename) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
 def download_data(url, filename):
     """
     Downloads data from the given URL and saves it locally.
+    If a local copy already exists, the request is conditional on the ETag and
+    Last-Modified headers saved alongside it, and the copy is kept when the
+    server reports it unchanged (HTTP 304).
     Retries are not implemented, but could be added for more robustness.
     """
+    meta_filename = filename + '.meta.json'
+    # requests transparently decompresses gzip-encoded responses
+    headers = {'Accept-Encoding': 'gzip'}
+    if os.path.exists(filename):
+        meta = load_download_metadata(meta_filename)
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
     print(f"Downloading data from {url}...")
+    temp_filename = filename + '.tmp'
     try:
         # Make a GET request to the URL
-        response = requests.get(url, stream=True)
+        response = requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT)
         # Raise an exception for bad status codes (4xx or 5xx)
         response.raise_for_status()
-        
-        # Write the content to a local file
-        with open(filename, 'wb') as f:
+        if response.status_code == 304:
+            response.close()
+            print(f"Data is unchanged on the server; keeping {filename}")
+            return True
+
+        # Write the content to a temporary file and move it into place once complete,
+        # so a failed download never replaces a good local copy
+        with open(temp_filename, 'wb') as f:
             for chunk in response.iter_content(chunk_size=8192): # Process in chunks
                 f.write(chunk)
+        os.replace(temp_filename, filename)
+
+        with open(meta_filename, 'w') as f:
+            json.dump({'etag': response.headers.get('ETag'),
+                       'last_modified': response.headers.get('Last-Modified')}, f)
         print(f"Data downloaded successfully and saved as {filename}")
         return True
     except requests.exceptions.RequestException as e:
         print(f"Error downloading data: {e}")
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
         return False
 
-def generate_zhvi_animation(zip_code_str):
+def parquet_cache_is_fresh(csv_filename, parquet_filename):
     """
-    Generates an animated GIF of the Zillow Home Value Index (ZHVI)
-    for the specified ZIP code.
+    Returns True if the Parquet cache exists and is at least as new as the CSV.
     """
-    # Step 1: Ensure data is downloaded
-    if not os.path.exists(CSV_FILENAME):
-        if not download_data(DATA_URL, CSV_FILENAME):
-            print("Failed to download data. Exiting.")
-            return
-    
-    # Step 2: Load data into pandas DataFrame
-    print(f"Loading ZHVI data from {CSV_FILENAME}...")
+    if not os.path.exists(parquet_filename):
+        return False
+    return os.path.getmtime(parquet_filename) >= os.path.getmtime(csv_filename)
+
+def csv_read_options(csv_filename):
+    """
+    Returns the pd.read_csv keyword arguments that restrict parsing to the
+    columns that are used, with fixed dtypes to skip type inference.
+    """
+    # Read only the header first so the monthly columns can be identified
+    header = pd.read_csv(csv_filename, nrows=0).columns
+    date_columns = [col_name for col_name in header if DATE_COLUMN_RE.match(col_name)]
+
+    # float32 is ample precision for home values and halves the memory of the monthly columns
+    dtypes = {'RegionName': 'int32', 'City': 'category', 'State': 'category'}
+    dtypes.update({col_name: 'float32' for col_name in date_columns})
+    return {'usecols': METADATA_COLUMNS + date_columns, 'dtype': dtypes, 'engine': 'c'}
+
+def find_zip_row_in_csv(csv_filename, zip_code_int):
+    """
+    Scans the CSV in chunks and returns the row for the given ZIP code as soon
+    as it is found, without parsing the rest of the file.
+    The DataFrame is empty if the ZIP code is not in the dataset.
+    """
+    with pd.read_csv(csv_filename, chunksize=CSV_CHUNK_SIZE, **csv_read_options(csv_filename)) as reader:
+        for chunk in reader:
+            hit = chunk[chunk['RegionName'] == zip_code_int]
+            if not hit.empty:
+                return hit
+    return pd.DataFrame(columns=METADATA_COLUMNS)
+
+def build_parquet_cache(csv_filename, parquet_filename):
+    """
+    Parses the CSV once and saves it as a zstd-compressed Parquet file so that
+    later runs can read a single row instead of re-parsing the whole CSV.
+    Returns the parsed DataFrame.
+    """
+    df = pd.read_csv(csv_filename, memory_map=True, **csv_read_options(csv_filename))
+    # Index by ZIP code so lookups are hash-based rather than a scan of every row
+    df = df.set_index('RegionName', drop=False).sort_index()
+
+    print(f"Building columnar cache {parquet_filename}...")
+    temp_filename = parquet_filename + '.tmp'
     try:
-        df = pd.read_csv(CSV_FILENAME)
+        # Write to a temporary file first so an interrupted run never leaves
+        # behind a truncated cache that looks newer than the CSV.
+        # Rows are sorted by ZIP code and split into small row groups, so the
+        # min/max statistics let a filtered read skip every group but one.
+        df.to_parquet(temp_filename, engine='pyarrow', compression='zstd', index=False,
+                      row_group_size=PARQUET_ROW_GROUP_SIZE)
+        os.replace(temp_filename, parquet_filename)
     except Exception as e:
-        print(f"Error reading CSV file {CSV_FILENAME}: {e}")
-        return
+        print(f"Warning: could not write cache {parquet_filename}: {e}")
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+    return df
 
-    # Step 3: Filter data for the specified ZIP code
-    # Zillow uses 'RegionName' for ZIP codes, which are often stored as integers.
-    try:
-        zip_code_int = int(zip_code_str)
-    except ValueError:
-        print(f"Invalid ZIP code format: '{zip_code_str}'. Please enter a numeric ZIP code.")
-        return
+def load_zip_row(zip_code_int):
+    """
+    Returns a DataFrame containing only the row for the given numeric ZIP code.
+    The DataFrame is empty if the ZIP code is not in the dataset.
+    """
+    if pq is None:
+        print(f"Scanning {CSV_FILENAME} for ZIP code {zip_code_int} (install pyarrow to cache it)...")
+        return find_zip_row_in_csv(CSV_FILENAME, zip_code_int)
+
+    if parquet_cache_is_fresh(CSV_FILENAME, PARQUET_FILENAME):
+        print(f"Loading ZHVI data from cache {PARQUET_FILENAME}...")
+        table = pq.read_table(PARQUET_FILENAME, filters=[('RegionName', '=', zip_code_int)])
+        return table.to_pandas()
+
+    print(f"Loading ZHVI data from {CSV_FILENAME}...")
+    df = build_parquet_cache(CSV_FILENAME, PARQUET_FILENAME)
+    if zip_code_int not in df.index:
+        return df.iloc[0:0]
+    return df.loc[[zip_code_int]]
+
+def build_palette(reference, chart_colors):
+    """
+    Returns a 'P' image holding the GIF palette for frames like the reference image.
+    The chart colors (as 0-1 RGB triples) get exact entries and the remaining slots
+    are chosen adaptively from the reference, leaving out colors so close to a chart
+    color that Pillow's quantizer could map that chart color onto them instead.
+    """
+    # Snap each chart color to the most common nearby color in the reference, since
+    # Agg's blending of translucent artists rounds slightly differently from float math
+    counts, present = zip(*reference.getcolors(reference.width * reference.height))
+    counts, present = np.array(counts), np.array(present)
+    exact = []
+    for rgb in np.asarray(chart_colors) * 255:
+        distance = np.abs(present - rgb).max(axis=1)
+        nearby = distance <= max(2, distance.min())
+        snapped = present[nearby][counts[nearby].argmax()]
+        if not any((snapped == color).all() for color in exact):
+            exact.append(snapped)
+    exact = np.array(exact)
+
+    adaptive = reference.quantize(colors=GIF_PALETTE_SIZE - len(exact), method=Image.Quantize.MEDIANCUT)
+    adaptive_colors = np.array(adaptive.getpalette()[:3 * (GIF_PALETTE_SIZE - len(exact))]).reshape(-1, 3)
+    distance = np.abs(adaptive_colors[:, None, :] - exact[None, :, :]).max(axis=2).min(axis=1)
+    colors = np.concatenate([exact, adaptive_colors[distance > 8]])
+
+    palette = Image.new('P', (1, 1))
+    palette.putpalette(colors.astype(np.uint8).ravel().tolist())
+    return palette
+
+class FrameRenderer:
+    """
+    Renders the chart of one ZIP code's ZHVI series up to a given data point as a GIF frame.
+    The axes, grid, labels and the fixed part of the title are drawn once with Matplotlib
+    into a background image; each frame only stamps the line and the date on a copy of it
+    with Pillow, which is far cheaper than a full Matplotlib redraw.
+    """
+
+    def __init__(self, time_num, values, month_labels, title_prefix, dpi=DEFAULT_FRAME_DPI):
+        self.month_labels = month_labels
+
+        # Overall min/max for consistent Y-axis scaling across frames
+        overall_min_val = np.nanmin(values)
+        overall_max_val = np.nanmax(values)
+        y_padding = (overall_max_val - overall_min_val) * 0.05 # 5% padding
+        if y_padding == 0: # Handle case where all values are the same
+            y_padding = overall_min_val * 0.1 if overall_min_val != 0 else 10000
+
+        fig, ax = plt.subplots(figsize=FRAME_FIGSIZE, dpi=dpi)
+        ax.xaxis_date()
+
+        # Set consistent plot limits based on the entire dataset for this ZIP
+        ax.set_xlim(time_num[0], time_num[-1])
+        ax.set_ylim(overall_min_val - y_padding, overall_max_val + y_padding)
+
+        # Titles and labels; the second title line is left blank and filled in per frame
+        title = ax.set_title(f"{title_prefix}\n ", fontsize=12)
+        ax.set_xlabel("Year-Month", fontsize=10)
+        ax.set_ylabel("Home Value Index (USD)", fontsize=10)
+
+        # Formatting
+        grid_alpha = 0.7
+        ax.grid(True, linestyle='--', alpha=grid_alpha)
+        plt.setp(ax.get_xticklabels(), rotation=45, ha="right") # Rotate x-axis labels for better readability
+        fig.tight_layout() # Adjust plot to prevent labels from being cut off
+
+        fig.canvas.draw()
+        width, height = fig.canvas.get_width_height()
+        self.background = Image.fromarray(np.asarray(fig.canvas.buffer_rgba())).convert('RGB')
 
-    # Filter the DataFrame for the given ZIP code
-    zip_data_row = df[df['RegionName'] == zip_code_int]
+        # Pixel position of every data point; Pillow's origin is the top-left corner
+        pixel_xy = ax.transData.transform(np.column_stack([time_num, values]))
+        pixel_xy[:, 1] = height - pixel_xy[:, 1]
+        self.points = [tuple(xy) for xy in pixel_xy.tolist()]
+
+        # Runs of consecutive months with data; as in Matplotlib, the line breaks at missing values
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], np.isfinite(values).astype(np.int8), [0]))))
+        self.runs = list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+        # Match Matplotlib's default line width (1.5pt) and '.' marker size at this dpi
+        self.line_width = max(1, round(1.5 * dpi / 72))
+        self.marker_radius = max(1.0, 1.5 * dpi / 72)
+
+        # The date line sits centered below the first title line, in the title font
+        title_bbox = title.get_window_extent()
+        self.date_xy = ((title_bbox.x0 + title_bbox.x1) / 2, height - title_bbox.y0)
+        self.font = ImageFont.truetype(font_manager.findfont(title.get_fontproperties()),
+                                       size=round(title.get_fontsize() * dpi / 72))
+        background_rgb = np.array(mcolors.to_rgb(fig.get_facecolor()))
+        plt.close(fig) # Close the figure to free up memory
+
+        # One palette shared by every frame, taken from the last frame since it contains
+        # every color that appears in the animation. The flat chart colors are kept exact:
+        # the background, the grid (drawn translucent over it), text and axes, and the line.
+        self.palette = build_palette(self.draw(len(values) - 1), [
+            background_rgb,
+            grid_alpha * np.array(mcolors.to_rgb(plt.rcParams['grid.color'])) + (1 - grid_alpha) * background_rgb,
+            mcolors.to_rgb(plt.rcParams['text.color']),
+            mcolors.to_rgb(LINE_COLOR),
+        ])
+
+    def draw(self, i):
+        """
+        Returns the chart covering data points 0..i as an RGB image.
+        """
+        frame = self.background.copy()
+        draw = ImageDraw.Draw(frame)
+        r = self.marker_radius
+        for start, stop in self.runs:
+            if start > i:
+                break
+            run_points = self.points[start:min(stop, i + 1)]
+            if len(run_points) > 1:
+                draw.line(run_points, fill=LINE_COLOR, width=self.line_width, joint='curve')
+            for x, y in run_points:
+                draw.ellipse((x - r, y - r, x + r, y + r), fill=LINE_COLOR)
+        draw.text(self.date_xy, f"As of {self.month_labels[i]}", fill='black', font=self.font, anchor='md')
+        return frame
+
+    def render(self, i):
+        """
+        Returns the chart covering data points 0..i as an image indexed into the shared palette.
+        """
+        return self.draw(i).quantize(palette=self.palette, dither=Image.Dither.NONE)
+
+# FrameRenderer owned by each worker process, created by init_frame_worker
+worker_renderer = None
+
+def init_frame_worker(*renderer_args):
+    """
+    Process pool initializer: builds the worker's figure once, so the series
+    arrays are sent to each worker a single time rather than with every frame.
+    """
+    global worker_renderer
+    worker_renderer = FrameRenderer(*renderer_args)
+
+def render_frame(frames_filename, frame_number, i):
+    """
+    Renders frame i in a worker process and writes its palette indices to slot
+    frame_number of the memory-mapped frames file, so the pixels never have to
+    be pickled back to the parent process.
+    """
+    frame = worker_renderer.render(i)
+    width, height = frame.size
+    frame_slot = np.memmap(frames_filename, dtype=np.uint8, mode='r+',
+                           offset=frame_number * width * height, shape=(height, width))
+    frame_slot[:] = np.asarray(frame)
+    frame_slot.flush()
+
+def save_gif(gif_filename, frames, duration_per_frame_seconds):
+    """
+    Writes palette-indexed frames to an animated GIF that loops forever.
+    """
+    frames[0].save(gif_filename, save_all=True, append_images=frames[1:], loop=0,
+                   duration=round(duration_per_frame_seconds * 1000), optimize=False)
+
+def save_gif_in_parallel(gif_filename, renderer_args, frame_indices, size, palette, num_workers,
+                         duration_per_frame_seconds):
+    """
+    Renders the frames in a pool of worker processes and writes them to the animated GIF.
+    Workers hand frames back through a memory-mapped file in a temporary directory,
+    which is kept until the GIF has been written.
+    """
+    width, height = size
+    num_frames = len(frame_indices)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Workers write the raw palette indices of each frame straight into this file
+        frames_filename = os.path.join(temp_dir, 'frames.raw')
+        frame_store = np.memmap(frames_filename, dtype=np.uint8, mode='w+', shape=(num_frames, height, width))
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=init_frame_worker,
+                                 initargs=renderer_args) as executor:
+            rendered = executor.map(render_frame, [frames_filename] * num_frames, range(num_frames),
+                                    frame_indices, chunksize=FRAMES_PER_TASK)
+            for _ in tqdm(rendered, total=num_frames, desc='Frames'):
+                pass
+
+        # Wrap each slot of the mapped file as an image without decoding or copying it
+        frames = []
+        for frame_number in range(num_frames):
+            frame = Image.frombuffer('P', size, frame_store[frame_number], 'raw', 'P', 0, 1)
+            frame.putpalette(palette)
+            frames.append(frame)
+        save_gif(gif_filename, frames, duration_per_frame_seconds)
+
+        # Release the mapping before the temporary directory is removed
+        del frame, frames, frame_store
+
+def extract_zip_series(zip_code_str, zip_code_int):
+    """
+    Loads the row for the given ZIP code and extracts its ZHVI time series.
+    Returns (time_index, values, city, state), or None after printing the reason
+    if the series cannot be extracted.
+    """
+    # The first run after a download parses the CSV and caches it as Parquet;
+    # subsequent runs read only the matching row from the cache.
+    try:
+        zip_data_row = load_zip_row(zip_code_int)
+    except Exception as e:
+        print(f"Error reading ZHVI data: {e}")
+        return None
 
     if zip_data_row.empty:
         print(f"ZIP code {zip_code_str} (numeric: {zip_code_int}) not found in the dataset.")
         print("Please ensure the ZIP code is correct and exists in the Zillow dataset.")
-        return
+        return None
+
+    # Identify and extract time series data (date columns and ZHVI values)
+    date_columns = [col_name for col_name in zip_data_row.columns
+                    if isinstance(col_name, str) and DATE_COLUMN_RE.match(col_name)]
 
-    # Step 4: Identify and extract time series data (date columns and ZHVI values)
-    date_columns = []
-    for col_name in df.columns:
-        try:
-            # Zillow uses 'YYYY-MM-DD' format for its monthly data columns
-            datetime.strptime(str(col_name), '%Y-%m-%d')
-            date_columns.append(str(col_name))
-        except (ValueError, TypeError):
-            # This column name is not in the expected date format or not a string
-            continue
-    
     if not date_columns:
         print("Could not automatically identify date columns containing ZHVI values.")
         print("Please check the CSV file structure.")
-        return
+        return None
 
     # Extract the ZHVI values for the identified date columns for the specific ZIP code
     # .squeeze() converts single-row DataFrame to a Series
-    zhvi_series = zip_data_row[date_columns].squeeze() 
+    zhvi_series = zip_data_row[date_columns].squeeze()
 
     if zhvi_series.empty or zhvi_series.isnull().all():
         print(f"No ZHVI data available or all data is null for ZIP code {zip_code_str}.")
-        return
+        return None
 
     # Convert date string index to datetime objects for proper plotting
     time_index = pd.to_datetime(zhvi_series.index)
-    values = zhvi_series.values
+    values = np.asarray(zhvi_series.values, dtype=np.float32)
+    return time_index, values, str(zip_data_row['City'].iloc[0]), str(zip_data_row['State'].iloc[0])
 
-    # Step 5: Generate frames for the animation
-    frames = []
-    # Create a temporary directory to store individual frames
-    with tempfile.TemporaryDirectory() as temp_dir:
-        print(f"Generating frames for animation in temporary directory: {temp_dir}...")
+def connect_series_cache():
+    """
+    Opens the per-ZIP series cache, creating its table if needed.
+    """
+    conn = sqlite3.connect(SERIES_CACHE_FILENAME)
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS zips ('
+        'RegionName INTEGER PRIMARY KEY, SourceMtimeNs INTEGER, City TEXT, State TEXT, Dates BLOB, ZHVI BLOB)'
+    )
+    return conn
 
-        # Determine a step for frames if there are too many data points to keep GIF reasonable
-        num_points = len(time_index)
-        frame_step = 1
-        max_frames_for_gif = 150 # Adjust for desired GIF length/smoothness
-        if num_points > max_frames_for_gif:
-            frame_step = max(1, num_points // max_frames_for_gif) 
-            print(f"Dataset has {num_points} monthly points. Plotting every {frame_step}th point for the animation.")
+def load_cached_series(zip_code_int, source_mtime_ns):
+    """
+    Returns (time_index, values, city, state) for the ZIP code from the series cache,
+    or None if it is not cached or was extracted from a different copy of the CSV.
+    """
+    try:
+        with closing(connect_series_cache()) as conn:
+            row = conn.execute(
+                'SELECT City, State, Dates, ZHVI FROM zips WHERE RegionName = ? AND SourceMtimeNs = ?',
+                (zip_code_int, source_mtime_ns),
+            ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Warning: could not read cache {SERIES_CACHE_FILENAME}: {e}")
+        return None
+    if row is None:
+        return None
 
-        # Extract City and State for a more descriptive title
-        city_name = zip_data_row['City'].iloc[0]
-        state_abbr = zip_data_row['State'].iloc[0]
-        location_info = f"{city_name}, {state_abbr}"
+    print(f"Loading ZHVI data for ZIP code {zip_code_int} from cache {SERIES_CACHE_FILENAME}...")
+    city_name, state_abbr, dates_blob, values_blob = row
+    time_index = pd.DatetimeIndex(np.frombuffer(dates_blob, dtype='datetime64[ns]'))
+    return time_index, np.frombuffer(values_blob, dtype=np.float32), city_name, state_abbr
 
-        # Overall min/max for consistent Y-axis scaling across frames
-        overall_min_val = zhvi_series.min()
-        overall_max_val = zhvi_series.max()
-        y_padding = (overall_max_val - overall_min_val) * 0.05 # 5% padding
-        if y_padding == 0: # Handle case where all values are the same
-            y_padding = overall_min_val * 0.1 if overall_min_val != 0 else 10000
+def save_cached_series(zip_code_int, source_mtime_ns, series):
+    """
+    Stores a ZIP code's extracted series in the series cache.
+    """
+    time_index, values, city_name, state_abbr = series
+    dates_blob = time_index.values.astype('datetime64[ns]').tobytes()
+    try:
+        with closing(connect_series_cache()) as conn, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO zips VALUES (?, ?, ?, ?, ?, ?)',
+                (zip_code_int, source_mtime_ns, city_name, state_abbr, dates_blob, values.tobytes()),
+            )
+    except sqlite3.Error as e:
+        print(f"Warning: could not write cache {SERIES_CACHE_FILENAME}: {e}")
+
+def optimize_gif(gif_filename):
+    """
+    Shrinks the GIF in place with gifsicle, if pygifsicle and gifsicle are installed.
+    """
+    if pygifsicle is None:
+        return
+    print(f"Optimizing {gif_filename} with gifsicle...")
+    try:
+        pygifsicle.gifsicle(gif_filename, colors=GIF_PALETTE_SIZE, options=['-O3', '--lossy=80'])
+    except Exception as e:
+        print(f"Warning: could not optimize {gif_filename} with gifsicle: {e}")
+
+def generate_zhvi_animation(zip_code_str, dpi=DEFAULT_FRAME_DPI):
+    """
+    Generates an animated GIF of the Zillow Home Value Index (ZHVI)
+    for the specified ZIP code. dpi sets the resolution of the frames.
+    """
+    # Step 1: Validate the ZIP code before any network access
+    # Zillow uses 'RegionName' for ZIP codes, which are often stored as integers.
+    try:
+        zip_code_int = int(zip_code_str)
+    except ValueError:
+        zip_code_int = None
+    # ZIP codes are at most five digits; larger numbers would also overflow the series cache key
+    if zip_code_int is None or not 0 <= zip_code_int <= 99999:
+        print(f"Invalid ZIP code format: '{zip_code_str}'. Please enter a numeric ZIP code.")
+        return
+
+    # Step 2: Ensure data is downloaded and up to date
+    if not download_data(DATA_URL, CSV_FILENAME):
+        if not os.path.exists(CSV_FILENAME):
+            print("Failed to download data. Exiting.")
+            return
+        print(f"Using the existing local copy of {CSV_FILENAME}.")
+
+    # Step 3: Load the time series for the specified ZIP code.
+    # ZIP codes extracted before from the same CSV are read from the series cache;
+    # otherwise the row is loaded from the Parquet cache (or the CSV) and then cached.
+    source_mtime_ns = os.stat(CSV_FILENAME).st_mtime_ns
+    series = load_cached_series(zip_code_int, source_mtime_ns)
+    if series is None:
+        series = extract_zip_series(zip_code_str, zip_code_int)
+        if series is None:
+            return
+        save_cached_series(zip_code_int, source_mtime_ns, series)
+    time_index, values, city_name, state_abbr = series
+
+    # values is already a contiguous float32 array; convert the dates the same way once,
+    # so every frame's cumulative data is a view rather than a copy
+    time_num = mdates.date2num(time_index)
+    month_labels = time_index.strftime('%Y-%m')
+
+    # Step 4: Choose the frames for the animation
+    # Pick evenly spaced data points, capped at a fixed frame count, to keep the GIF reasonable.
+    # The first and last points are always included.
+    num_points = len(time_index)
+    max_frames_for_gif = 150 # Adjust for desired GIF length/smoothness
+    frame_indices = np.unique(np.linspace(0, num_points - 1, min(num_points, max_frames_for_gif), dtype=np.int64))
+    if num_points > max_frames_for_gif:
+        print(f"Dataset has {num_points} monthly points. Plotting {len(frame_indices)} evenly spaced points for the animation.")
+
+    # City and State make for a more descriptive title
+    location_info = f"{city_name}, {state_abbr}"
+    title_prefix = f"Zillow Home Value Index (ZHVI) for ZIP: {zip_code_str} ({location_info})"
+
+    # Step 5: Render the frames (in parallel for large jobs) and write them to the animated GIF.
+    # Frames are already palette-indexed (1 byte per pixel), so Pillow writes them
+    # without re-quantizing and only stores the changed rectangle of each frame.
+    gif_filename = f"zhvi_animation_{zip_code_str}.gif"
+    print(f"Generating frames and creating animated GIF: {gif_filename}...")
+
+    duration_per_frame_seconds = 0.15 # Default duration per frame in seconds
+    if len(frame_indices) < 50:
+        duration_per_frame_seconds = 0.3
+    elif len(frame_indices) > 120:
+        duration_per_frame_seconds = 0.1
+
+    renderer_args = (time_num, values, list(month_labels), title_prefix, dpi)
+    renderer = FrameRenderer(*renderer_args)
+    width, height = renderer.background.size
+    num_frames = len(frame_indices)
+    # Each worker pays for its own process start-up and FrameRenderer, so extra workers are
+    # only used for jobs with enough pixels to draw to make up for that, and each gets
+    # at least one chunk of frames
+    num_workers = min(os.cpu_count() or 1,
+                      math.ceil(num_frames / FRAMES_PER_TASK),
+                      num_frames * width * height // PIXELS_PER_WORKER)
+    if num_workers > 1:
+        save_gif_in_parallel(gif_filename, renderer_args, frame_indices, (width, height),
+                             renderer.palette.getpalette(), num_workers, duration_per_frame_seconds)
+    else:
+        frames = [renderer.render(i) for i in tqdm(frame_indices, desc='Frames')]
+        save_gif(gif_filename, frames, duration_per_frame_seconds)
 
+    optimize_gif(gif_filename)
+    print(f"Animated GIF successfully saved as {gif_filename} in the current directory.")
 
-        for i in range(0, num_points, frame_step):
-            current_time_subset = time_index[:i+1]
-            current_values_subset = values[:i+1]
-
-            fig, ax = plt.subplots(figsize=(12, 7)) # Create a new figure for each frame
-            ax.plot(current_time_subset, current_values_subset, marker='.', linestyle='-', color='dodgerblue')
-            
-            # Set consistent plot limits based on the entire dataset for this ZIP
-            ax.set_xlim(time_index.min(), time_index.max())
-            ax.set_ylim(overall_min_val - y_padding, overall_max_val + y_padding)
-
-            # Titles and labels
-            current_month_year = time_index[i].strftime('%Y-%m')
-            ax.set_title(f"Zillow Home Value Index (ZHVI) for ZIP: {zip_code_str} ({location_info})\nAs of {current_month_year}", fontsize=15)
-            ax.set_xlabel("Year-Month", fontsize=12)
-            ax.set_ylabel("Home Value Index (USD)", fontsize=12)
-            
-            # Formatting
-            ax.grid(True, linestyle='--', alpha=0.7)
-            plt.xticks(rotation=45, ha="right") # Rotate x-axis labels for better readability
-            plt.tight_layout() # Adjust plot to prevent labels from being cut off
-
-            frame_filename = os.path.join(temp_dir, f"frame_{i:04d}.png")
-            plt.savefig(frame_filename)
-            plt.close(fig) # Close the figure to free up memory
-            
-            frames.append(imageio.imread(frame_filename))
-            if (i // frame_step) % 20 == 0 : # Print progress every 20 frames
-                 print(f"  Generated frame {i // frame_step + 1}/{ (num_points-1)//frame_step + 1 }...")
-
-
-        # Step 6: Create animated GIF from the frames
-        gif_filename = f"zhvi_animation_{zip_code_str}.gif"
-        print(f"Creating animated GIF: {gif_filename}...")
-        
-        num_actual_frames = len(frames)
-        duration_per_frame_seconds = 0.15 # Default duration per frame in seconds
-        if num_actual_frames < 50:
-            duration_per_frame_seconds = 0.3
-        elif num_actual_frames > 120:
-            duration_per_frame_seconds = 0.1
-        
-        imageio.mimsave(gif_filename, frames, duration=duration_per_frame_seconds)
-        print(f"Animated GIF successfully saved as {gif_filename} in the current directory.")
-
-    # Temporary directory and its contents are automatically cleaned up upon exiting the 'with' block.
     print("Process complete.")
 
 if __name__ == "__main__":